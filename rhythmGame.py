@@ -2,6 +2,11 @@ import pygame
 import random
 import csv
 import time
+import atexit
+import functools
+import queue
+import threading
+from collections import deque
 from datetime import datetime
 from typing import List, Dict, Optional
 import os
@@ -21,27 +26,42 @@ GRAY = (169, 169, 169)
 
 # Game configurations
 KEYS = ['D', 'F', 'J', 'K']
+NUM_LANES = len(KEYS)
+KEY_TO_LANE = {getattr(pygame, f"K_{key.lower()}"): lane for lane, key in enumerate(KEYS)}
+REDRAW_EVENTS = (pygame.VIDEOEXPOSE, pygame.WINDOWEXPOSED, pygame.WINDOWRESTORED)  # Window events that need a prompt redrawn
 GAME_DURATION = 70 # Seconds
 LEVELS = 5
 NOTE_WIDTH = 80
 NOTE_HEIGHT = 40
 HIT_LINE_Y = WINDOW_HEIGHT - 100
+HIT_WINDOW_TOP = HIT_LINE_Y - NOTE_HEIGHT  # Notes at or below this y can be hit
 BASIC_SPEED = 2
 BLOCK_SPEED_ACCR = 0.0
 LEVEL_SPEED_ACCR = 3.5
 SPAWN_INTERVAL = 0.6 #1.0
+LANE_WIDTH = WINDOW_WIDTH // NUM_LANES
+LANE_X = tuple(LANE_WIDTH * lane + (LANE_WIDTH - NOTE_WIDTH) // 2 for lane in range(NUM_LANES))  # Note x per lane
+CSV_FLUSH_ROWS = 64 # Hit rows buffered before flushing to disk
+NS_PER_MS = 1_000_000
+NS_PER_SECOND = 1_000_000_000
+MISSED_NOTE_LINGER_NS = NS_PER_SECOND // 2  # How long a missed note stays on screen
+
+# Monotonic integer clock used for all in-game timing
+_now = time.monotonic_ns
 
 class Note:
     """Note class representing falling blocks."""
+    __slots__ = ('lane', 'x', 'y', 'speed', 'state', 'hit_time', 'start_hit_time', 'miss_time')
+
     def __init__(self, lane: int, speed: float, y: float = 0):
         self.lane = lane
-        self.x = (WINDOW_WIDTH // len(KEYS)) * lane + (WINDOW_WIDTH // len(KEYS) - NOTE_WIDTH) // 2
+        self.x = LANE_X[lane]
         self.y = y
         self.speed = speed
         self.state = 'active'  # active, hit, missed
-        self.hit_time: Optional[float] = None
-        self.start_hit_time: Optional[float] = None
-        self.miss_time: Optional[float] = None
+        self.hit_time: Optional[int] = None  # Nanoseconds, see _now
+        self.start_hit_time: Optional[int] = None
+        self.miss_time: Optional[int] = None
 
 class DifficultyManager:
     """Difficulty manager that controls game difficulty."""
@@ -80,11 +100,13 @@ class DifficultyManager:
 
 class DataCollector:
     """Data collector that records game data."""
+    _FLUSH = object()  # Queue marker asking the writer thread to flush
+
     def __init__(self, player_name: str, mode: str):
         self.player_name = player_name
         self.mode = mode
-        self.session_data = []
-        self.start_time = time.time()
+        self.reset_counters()
+        self.start_time_ns = _now()
         self.level = 1
 
         # Ensure that the data folder exists
@@ -96,181 +118,286 @@ class DataCollector:
         self.timestamp = timestamp
         self.filename = f"data/{player_name}_{mode}_{timestamp}.csv"
 
+        # Keep the CSV file open for the whole session and buffer rows;
+        # after the header, only the writer thread touches it
+        self._fh = open(self.filename, 'w', newline='', buffering=1 << 16)
+        self._writer = csv.writer(self._fh)
+        self._pending = 0  # Rows written since the last flush
+        self._queue = queue.Queue()
+        self._write_error: Optional[Exception] = None  # Set if the writer thread fails
+        self._speed_text: Dict[float, str] = {}  # Formatted speed per distinct note speed
+
         # Write CSV header
-        with open(self.filename, 'w', newline='') as f:
-            writer = csv.writer(f)
-            writer.writerow([
-                'timestamp', 'level', 'lane', 'hit_status',
-                'reaction_time', 'reaction_distance', 'speed'
-            ])
+        self._writer.writerow([
+            'timestamp', 'level', 'lane', 'hit_status',
+            'reaction_time', 'reaction_distance', 'speed'
+        ])
+
+        # Feedback and analysis files get one row per level
+        self.feedback_filename = f"data/{player_name}_{mode}_feedback_{timestamp}.csv"
+        self._feedback_fh = open(self.feedback_filename, 'w', newline='')
+        self._feedback_writer = csv.writer(self._feedback_fh)
+        self._feedback_writer.writerow([
+            'timestamp',
+            'level',
+            'satisfaction',
+            'enjoyment',
+            'frustration',
+            'game_duration',
+            'exited'
+        ])
+
+        self.analysis_filename = f"data/{player_name}_{mode}_analysis_{timestamp}.csv"
+        self._analysis_fh = open(self.analysis_filename, 'w', newline='')
+        self._analysis_writer = csv.writer(self._analysis_fh)
+        self._analysis_writer.writerow([
+            'timestamp',
+            'level',
+            'hit_rate',
+            'lane_hit_rates',
+            'avg_reaction_time',
+            'avg_lane_reaction_times',
+            'incorrect_hit_rate',
+            'lane_incorrect_hit_rates',
+            'game_duration',
+            'exit_rate'
+        ])
+
+        self._writer_thread = threading.Thread(target=self._write_rows, daemon=True)
+        self._writer_thread.start()
+        atexit.register(self.close)
 
     def record_hit(self, note: Note, level: int, hit_status: str):
         """Record a hit event."""
-        timestamp = time.time() - self.start_time
-        if note.hit_time and note.start_hit_time:
-            reaction_time = note.hit_time - note.start_hit_time
+        timestamp = (_now() - self.start_time_ns) // NS_PER_MS
+        if note.hit_time is not None and note.start_hit_time is not None:
+            reaction_time = (note.hit_time - note.start_hit_time) // NS_PER_MS
         else:
             reaction_time = None
-        if note.hit_time:
+        if note.hit_time is not None:
             reaction_distance = abs(note.y - HIT_LINE_Y)
         else:
             reaction_distance = None
 
-        data = {
-            'timestamp': int(timestamp * 1000),  # Integer milliseconds
-            'level': level,
-            'lane': note.lane,
-            'hit_status': hit_status,
-            'reaction_time': int(reaction_time * 1000) if reaction_time else None,
-            'reaction_distance': int(reaction_distance) if reaction_distance else None,
-            'speed': round(note.speed, 2)
-        }
+        # Only a handful of speeds occur, so format each one once
+        speed_text = self._speed_text.get(note.speed)
+        if speed_text is None:
+            speed_text = self._speed_text[note.speed] = str(round(note.speed, 2))
+
+        # Integers and strings only, so the writer never formats a float
+        row = (
+            timestamp,  # Integer milliseconds
+            level,
+            note.lane,
+            hit_status,
+            reaction_time,
+            int(reaction_distance) if reaction_distance else None,
+            speed_text
+        )
 
-        self.session_data.append(data)
-
-        # Write to CSV in real-time
-        with open(self.filename, 'a', newline='') as f:
-            writer = csv.writer(f)
-            writer.writerow([
-                data['timestamp'],
-                data['level'],
-                data['lane'],
-                data['hit_status'],
-                data['reaction_time'],
-                data['reaction_distance'],
-                data['speed']
-            ])
+        # Running per-lane counters read by analyze_data
+        lane = note.lane
+        if hit_status == 'hit':
+            self.lane_hits[lane] += 1
+            self.lane_totals[lane] += 1
+        elif hit_status == 'miss':
+            self.lane_totals[lane] += 1
+        elif hit_status == 'incorrect':
+            self.lane_incorrect_hits[lane] += 1
+        if reaction_time is not None:
+            self.lane_rt_sums[lane] += reaction_time
+            self.lane_rt_counts[lane] += 1
+
+        # Hand the row to the writer thread so disk I/O never stalls a frame
+        self.check_write_error()
+        self._queue.put(row)
+
+    def _write_rows(self):
+        """Writer thread: write queued rows, flushing every CSV_FLUSH_ROWS rows."""
+        while True:
+            row = self._queue.get()
+            try:
+                if row is None:
+                    break
+                if self._write_error is not None:
+                    # Writing already failed; drop rows so waiters are released
+                    continue
+                if row is self._FLUSH:
+                    self._fh.flush()
+                    self._pending = 0
+                else:
+                    self._writer.writerow(row)
+                    self._pending += 1
+                    if self._pending >= CSV_FLUSH_ROWS:
+                        self._fh.flush()
+                        self._pending = 0
+            except Exception as error:
+                # Re-raised on the main thread by check_write_error
+                self._write_error = error
+            finally:
+                self._queue.task_done()
+
+    def check_write_error(self):
+        """Raise the error that stopped the writer thread, if any."""
+        if self._write_error is not None:
+            raise self._write_error
+
+    def reset_counters(self):
+        """Zero the per-lane counters for a new level."""
+        self.lane_hits = [0] * NUM_LANES
+        self.lane_totals = [0] * NUM_LANES  # Hits and misses
+        self.lane_incorrect_hits = [0] * NUM_LANES
+        self.lane_rt_sums = [0] * NUM_LANES
+        self.lane_rt_counts = [0] * NUM_LANES
+
+    def flush(self):
+        """Write out all queued hit rows and flush them to the OS."""
+        if self._writer_thread.is_alive():
+            self._queue.put(self._FLUSH)
+            self._queue.join()
+        self.check_write_error()
+
+    def close(self):
+        """Close all CSV files. Safe to call more than once."""
+        atexit.unregister(self.close)
+        if self._writer_thread.is_alive():
+            self._queue.put(None)
+            self._writer_thread.join()
+        try:
+            self._fh.close()
+        finally:
+            self._feedback_fh.close()
+            self._analysis_fh.close()
+        self.check_write_error()
 
     def save_feedback(self, level: int, feedback: List[int], total_time: float, exited: bool):
         """Save feedback data."""
         self.level = level  # Set the current level
-        feedback_filename = f"data/{self.player_name}_{self.mode}_feedback_{self.timestamp}.csv"
-        # Ensure the header exists
-        if not os.path.exists(feedback_filename):
-            with open(feedback_filename, 'w', newline='') as f:
-                writer = csv.writer(f)
-                writer.writerow([
-                    'timestamp',
-                    'level',
-                    'satisfaction',
-                    'enjoyment',
-                    'frustration',
-                    'game_duration',
-                    'exited'
-                ])
-        # Append feedback data
-        with open(feedback_filename, 'a', newline='') as f:
-            writer = csv.writer(f)
-            writer.writerow([
-                datetime.now(),
-                level,
-                *feedback,
-                total_time,
-                exited
-            ])
+        self.flush()
+        self._feedback_writer.writerow([
+            datetime.now(),
+            level,
+            *feedback,
+            total_time,
+            exited
+        ])
+        self._feedback_fh.flush()
 
     def analyze_data(self, total_time: float, exited: bool):
         """Analyze data and calculate dependent variables."""
-        total_hits = sum(1 for d in self.session_data if d['hit_status'] == 'hit')
-        total_notes = sum(1 for d in self.session_data if d['hit_status'] in ['hit', 'miss'])
+        self.flush()
+        lane_hits = self.lane_hits
+        lane_totals = self.lane_totals
+        lane_incorrect_hits = self.lane_incorrect_hits
+        lane_rt_sums = self.lane_rt_sums
+        lane_rt_counts = self.lane_rt_counts
+
+        # Hit rate
+        total_hits = sum(lane_hits)
+        total_notes = sum(lane_totals)
         hit_rate = total_hits / total_notes if total_notes > 0 else 0
-
-        # Hit rate for each lane
-        lane_hits = {lane: 0 for lane in range(len(KEYS))}
-        lane_totals = {lane: 0 for lane in range(len(KEYS))}
-        for d in self.session_data:
-            if d['hit_status'] in ['hit', 'miss']:
-                lane_totals[d['lane']] += 1
-                if d['hit_status'] == 'hit':
-                    lane_hits[d['lane']] += 1
-
-        lane_hit_rates = {lane: lane_hits[lane] / lane_totals[lane] if lane_totals[lane] > 0 else 0 for lane in range(len(KEYS))}
+        lane_hit_rates = {lane: lane_hits[lane] / lane_totals[lane] if lane_totals[lane] > 0 else 0 for lane in range(NUM_LANES)}
 
         # Reaction time
-        reaction_times = [d['reaction_time'] for d in self.session_data if d['reaction_time'] is not None]
-        avg_reaction_time = sum(reaction_times) / len(reaction_times) if reaction_times else 0
-
-        # Reaction time for each lane
-        lane_reaction_times = {lane: [] for lane in range(len(KEYS))}
-        for d in self.session_data:
-            if d['reaction_time'] is not None:
-                lane_reaction_times[d['lane']].append(d['reaction_time'])
-        avg_lane_reaction_times = {lane: (sum(times) / len(times)) if times else 0 for lane, times in lane_reaction_times.items()}
+        rt_sum = sum(lane_rt_sums)
+        rt_count = sum(lane_rt_counts)
+        avg_reaction_time = rt_sum / rt_count if rt_count else 0
+        avg_lane_reaction_times = {lane: lane_rt_sums[lane] / lane_rt_counts[lane] if lane_rt_counts[lane] else 0 for lane in range(NUM_LANES)}
 
         # Incorrect hit rate
-        total_incorrect_hits = sum(1 for d in self.session_data if d['hit_status'] == 'incorrect')
+        total_incorrect_hits = sum(lane_incorrect_hits)
         total_effective_hits = total_hits + total_incorrect_hits
         incorrect_hit_rate = total_incorrect_hits / total_effective_hits if total_effective_hits > 0 else 0
-
-        # Incorrect hit rate for each lane
-        lane_incorrect_hits = {lane: 0 for lane in range(len(KEYS))}
-        lane_effective_hits = {lane: 0 for lane in range(len(KEYS))}
-        for d in self.session_data:
-            if d['hit_status'] in ['hit', 'incorrect']:
-                lane_effective_hits[d['lane']] += 1
-                if d['hit_status'] == 'incorrect':
-                    lane_incorrect_hits[d['lane']] += 1
-        lane_incorrect_hit_rates = {lane: lane_incorrect_hits[lane] / lane_effective_hits[lane] if lane_effective_hits[lane] > 0 else 0 for lane in range(len(KEYS))}
+        lane_effective_hits = [lane_hits[lane] + lane_incorrect_hits[lane] for lane in range(NUM_LANES)]
+        lane_incorrect_hit_rates = {lane: lane_incorrect_hits[lane] / lane_effective_hits[lane] if lane_effective_hits[lane] > 0 else 0 for lane in range(NUM_LANES)}
 
         # Game duration and exit rate
         game_duration = total_time
         exit_rate = 1 if exited else 0
 
         # Save analysis data
-        analysis_filename = f"data/{self.player_name}_{self.mode}_analysis_{self.timestamp}.csv"
-        # Ensure header exists
-        if not os.path.exists(analysis_filename):
-            with open(analysis_filename, 'w', newline='') as f:
-                writer = csv.writer(f)
-                writer.writerow([
-                    'timestamp',
-                    'level',
-                    'hit_rate',
-                    'lane_hit_rates',
-                    'avg_reaction_time',
-                    'avg_lane_reaction_times',
-                    'incorrect_hit_rate',
-                    'lane_incorrect_hit_rates',
-                    'game_duration',
-                    'exit_rate'
-                ])
-        # Append analysis data
-        with open(analysis_filename, 'a', newline='') as f:
-            writer = csv.writer(f)
-            writer.writerow([
-                datetime.now(),
-                self.level,
-                hit_rate,
-                lane_hit_rates,
-                avg_reaction_time,
-                avg_lane_reaction_times,
-                incorrect_hit_rate,
-                lane_incorrect_hit_rates,
-                game_duration,
-                exit_rate
-            ])
-
-        # Clear session data
-        self.session_data = []
+        self._analysis_writer.writerow([
+            datetime.now(),
+            self.level,
+            hit_rate,
+            lane_hit_rates,
+            avg_reaction_time,
+            avg_lane_reaction_times,
+            incorrect_hit_rate,
+            lane_incorrect_hit_rates,
+            game_duration,
+            exit_rate
+        ])
+        self._analysis_fh.flush()
+
+        # Start counting the next level from zero
+        self.reset_counters()
 
 class NoteGenerator:
     """Note generator."""
     def __init__(self, difficulty_manager: DifficultyManager):
         self.difficulty_manager = difficulty_manager
         self.notes: List[Note] = []
+        self.lane_queues = [deque() for _ in range(NUM_LANES)]  # Active notes per lane, lowest first
         self.last_spawn_time = 0
         self.spawn_interval = SPAWN_INTERVAL # Initial spawn interval
 
+    def reset(self) -> None:
+        """Clear all notes and spawn timing for a new level."""
+        self.notes.clear()
+        for lane_queue in self.lane_queues:
+            lane_queue.clear()
+        self.last_spawn_time = 0
+        self.spawn_interval = SPAWN_INTERVAL
+
     def update(self, current_time: float) -> None:
         """Update note generation."""
         speed = self.difficulty_manager.get_speed(current_time)
         # Adjust spawn interval based on speed
         #[Optional] self.spawn_interval = max(0.5, 2.0 - speed / 5.0)
         if current_time - self.last_spawn_time >= self.spawn_interval:
-            lane = random.randint(0, len(KEYS) - 1)
-            self.notes.append(Note(lane, speed))
+            lane = random.randrange(NUM_LANES)
+            note = Note(lane, speed)
+            self.notes.append(note)
+            self.lane_queues[lane].append(note)
             self.last_spawn_time = current_time
 
+    def advance(self, now: int) -> List[Note]:
+        """Move notes down by one frame and return the notes missed on this frame."""
+        # Compact the list in place as we go
+        notes = self.notes
+        missed = []
+        kept = 0
+        for note in notes:
+            state = note.state
+            if state == 'active':
+                y = note.y + note.speed
+                note.y = y
+
+                # Set the time when the note becomes hittable
+                if y >= HIT_WINDOW_TOP and note.start_hit_time is None:
+                    note.start_hit_time = now
+
+                # Check if the note has been missed
+                if y > HIT_LINE_Y:
+                    note.state = 'missed'
+                    note.miss_time = now
+                    missed.append(note)
+
+            elif state == 'missed':
+                # Remove missed notes after a certain time
+                if now - note.miss_time > MISSED_NOTE_LINGER_NS:
+                    continue
+
+            else:
+                # Hit notes are dropped here rather than in Game.handle_note_hit
+                continue
+
+            notes[kept] = note
+            kept += 1
+        del notes[kept:]
+        return missed
+
 class Game:
     """Main game class."""
     def __init__(self):
@@ -281,12 +408,31 @@ class Game:
         self.clock = pygame.time.Clock()
         self.font = pygame.font.Font(None, 36)
 
+        # HUD labels never change, so render them once; numbers are cached per value
+        self._label_surfs = {
+            name: self.font.render(f"{name}: ", True, WHITE)
+            for name in ("Time", "Level", "Hits", "Combo")
+        }
+        self._render_int = functools.lru_cache(maxsize=256)(self.render_number)
+
+        # Pre-render the playfield (lanes and judgment line), one per line color
+        self.playfield_normal = self.render_playfield(WHITE)
+        self.playfield_flash = self.render_playfield(RED)
+
+        # Note blocks are blitted from pre-filled surfaces
+        self.note_surf_active = pygame.Surface((NOTE_WIDTH, NOTE_HEIGHT)).convert()
+        self.note_surf_active.fill(BLUE)
+        self.note_surf_missed = pygame.Surface((NOTE_WIDTH, NOTE_HEIGHT)).convert()
+        self.note_surf_missed.fill(RED)
+
         self.mode = None
         self.player_name = None
+        self.data_collector = None
         self.running = True
         self.paused = False
         self.in_menu = True
         self.game_over = False
+        self.set_handlers()
 
     def init_game(self):
         """Initialize game state."""
@@ -313,8 +459,10 @@ class Game:
         self.difficulty_manager.set_levels(levels)
         self.difficulty_manager.set_level(self.current_level)
         self.note_generator = NoteGenerator(self.difficulty_manager)
+        if self.data_collector is not None:
+            self.data_collector.close()
         self.data_collector = DataCollector(self.player_name, self.mode)
-        self.start_time = time.time()
+        self.start_time_ns = _now()
         self.combo = 0
         self.hits = 0
         self.incorrect_hits = 0
@@ -322,9 +470,10 @@ class Game:
         self.paused = False
         self.game_over = False
         self.hit_line_flash_timer = 0
-        self.pause_start_time = None
-        self.total_paused_time = 0
+        self.pause_start_ns = None
+        self.total_paused_ns = 0
         self.current_time = 0  # Add current_time variable
+        self.set_handlers()
 
     def handle_input(self):
         """Handle input."""
@@ -337,11 +486,12 @@ class Game:
                     if not self.in_menu and not self.game_over:
                         self.paused = not self.paused
                         if self.paused:
-                            self.pause_start_time = time.time()
+                            self.pause_start_ns = _now()
                         else:
-                            paused_duration = time.time() - self.pause_start_time
-                            self.total_paused_time += paused_duration
-                            self.pause_start_time = None
+                            paused_duration = _now() - self.pause_start_ns
+                            self.total_paused_ns += paused_duration
+                            self.pause_start_ns = None
+                        self.set_handlers()
                 elif event.key == pygame.K_s:
                     # Skip level
                     if self.confirm_action("Skip Level? (y/n)"):
@@ -355,71 +505,86 @@ class Game:
                     if self.confirm_action("Quit Game? (y/n)"):
                         self.running = False
 
-                # Handle input in the main menu
-                if self.in_menu:
-                    if event.key in [pygame.K_1, pygame.K_2]:
-                        self.mode = "test" if event.key == pygame.K_1 else "normal"
-                        self.get_player_name()
-                        self.in_menu = False
-                        self.init_game()
-                else:
-                    key = pygame.key.name(event.key).upper()
-                    if key in KEYS:
-                        self.handle_note_hit(key)
+                # The keys above may have changed state, so look the handler up now
+                self.key_handler(event.key)
+
+    def handle_menu_key(self, key):
+        """Handle a key press in the main menu."""
+        if key in [pygame.K_1, pygame.K_2]:
+            self.mode = "test" if key == pygame.K_1 else "normal"
+            self.get_player_name()
+            self.in_menu = False
+            self.init_game()
+
+    def handle_game_key(self, key):
+        """Handle a key press during a game."""
+        lane = KEY_TO_LANE.get(key)
+        if lane is not None:
+            self.handle_note_hit(lane)
+
+    def set_handlers(self):
+        """Bind the per-frame handlers to the current state."""
+        if self.in_menu:
+            self.key_handler = self.handle_menu_key
+        else:
+            self.key_handler = self.handle_game_key
+
+        if self.paused or self.in_menu or self.game_over:
+            self.update_handler = self.update_idle
+        else:
+            self.update_handler = self.update
 
     def confirm_action(self, message):
         """Confirm an action."""
-        confirmed = False
-        waiting_for_input = True
-        while waiting_for_input:
-            for event in pygame.event.get():
-                if event.type == pygame.QUIT:
-                    pygame.quit()
-                    exit()
-                elif event.type == pygame.KEYDOWN:
-                    if event.key == pygame.K_y:
-                        confirmed = True
-                        waiting_for_input = False
-                    elif event.key == pygame.K_n:
-                        confirmed = False
-                        waiting_for_input = False
-            self.screen.fill(BLACK)
-            prompt = self.font.render(message, True, WHITE)
-            self.screen.blit(prompt, (WINDOW_WIDTH//2 - prompt.get_width()//2, WINDOW_HEIGHT//2))
-            pygame.display.flip()
-            self.clock.tick(FPS)
-        return confirmed
+        prompt = self.font.render(message, True, WHITE)
+        redraw = True
+
+        # The prompt is static, so block until the player answers
+        while True:
+            if redraw:
+                self.screen.fill(BLACK)
+                self.screen.blit(prompt, (WINDOW_WIDTH//2 - prompt.get_width()//2, WINDOW_HEIGHT//2))
+                pygame.display.flip()
+                redraw = False
+
+            event = pygame.event.wait()
+            if event.type in REDRAW_EVENTS:
+                redraw = True
+            elif event.type == pygame.QUIT:
+                pygame.quit()
+                exit()
+            elif event.type == pygame.KEYDOWN:
+                if event.key == pygame.K_y:
+                    return True
+                elif event.key == pygame.K_n:
+                    return False
 
-    def handle_note_hit(self, key: str):
+    def handle_note_hit(self, lane: int):
         """Handle note hit."""
-        lane = KEYS.index(key)
         hit = False
-        duplicate = False
-
-        for note in self.note_generator.notes[:]:
-            if note.lane == lane and note.state == 'active':
-                if HIT_LINE_Y - NOTE_HEIGHT <= note.y <= HIT_LINE_Y:
-                    # Can be hit
-                    note.state = 'hit'
-                    note.hit_time = time.time()
-                    hit = True
-                    self.combo += 1
-                    self.hits += 1
-                    self.total_notes += 1
-                    self.data_collector.record_hit(note, self.current_level, 'hit')
-                    self.note_generator.notes.remove(note)
-                    break
-                elif note.state == 'hit':
-                    # Duplicate hit
-                    duplicate = True
-                    self.data_collector.record_hit(note, self.current_level, 'duplicated')
-                    break
 
-        if not hit and not duplicate:
+        # Only the lowest active note in the lane can be in the hit window;
+        # notes that were missed are dropped lazily once they reach the head
+        lane_queue = self.note_generator.lane_queues[lane]
+        while lane_queue and lane_queue[0].state != 'active':
+            lane_queue.popleft()
+
+        if lane_queue and HIT_WINDOW_TOP <= lane_queue[0].y <= HIT_LINE_Y:
+            # Can be hit
+            note = lane_queue.popleft()
+            note.state = 'hit'
+            note.hit_time = _now()
+            hit = True
+            self.combo += 1
+            self.hits += 1
+            self.total_notes += 1
+            self.data_collector.record_hit(note, self.current_level, 'hit')
+
+        if not hit:
             # Incorrect key press
             self.combo = 0
             dummy_note = Note(lane, self.difficulty_manager.current_speed, y=HIT_LINE_Y)
-            dummy_note.hit_time = time.time()
+            dummy_note.hit_time = _now()
             self.data_collector.record_hit(
                 dummy_note,
                 self.current_level,
@@ -428,11 +593,35 @@ class Game:
             self.incorrect_hits += 1
             self.hit_line_flash_timer = 0.2  # Red line flash duration
 
+    def render_playfield(self, hit_line_color) -> pygame.Surface:
+        """Render the static game background with the given judgment line color."""
+        surface = pygame.Surface((WINDOW_WIDTH, WINDOW_HEIGHT)).convert()
+        surface.fill(BLACK)
+
+        # Draw lanes
+        for i in range(NUM_LANES):
+            pygame.draw.line(
+                surface,
+                GRAY,
+                (LANE_WIDTH * i, 0),
+                (LANE_WIDTH * i, WINDOW_HEIGHT),
+                2
+            )
+
+        # Draw the judgment line
+        pygame.draw.line(
+            surface,
+            hit_line_color,
+            (0, HIT_LINE_Y),
+            (WINDOW_WIDTH, HIT_LINE_Y),
+            2
+        )
+        return surface
+
     def draw(self):
         """Draw the game screen."""
-        self.screen.fill(BLACK)
-
         if self.in_menu:
+            self.screen.fill(BLACK)
             self.draw_menu()
         else:
             self.draw_game()
@@ -451,43 +640,20 @@ class Game:
 
     def draw_game(self):
         """Draw the game interface."""
-        # Draw lanes
-        lane_width = WINDOW_WIDTH // len(KEYS)
-        for i in range(len(KEYS)):
-            pygame.draw.line(
-                self.screen,
-                GRAY,
-                (lane_width * i, 0),
-                (lane_width * i, WINDOW_HEIGHT),
-                2
-            )
-
-        # Draw the judgment line
-        hit_line_color = RED if self.hit_line_flash_timer > 0 else WHITE
-        pygame.draw.line(
-            self.screen,
-            hit_line_color,
-            (0, HIT_LINE_Y),
-            (WINDOW_WIDTH, HIT_LINE_Y),
-            2
-        )
+        # Lanes and judgment line; the background also clears the screen
+        if self.hit_line_flash_timer > 0:
+            self.screen.blit(self.playfield_flash, (0, 0))
+        else:
+            self.screen.blit(self.playfield_normal, (0, 0))
 
-        # Draw notes
-        for note in self.note_generator.notes:
-            if note.state == 'active':
-                color = BLUE
-                pygame.draw.rect(
-                    self.screen,
-                    color,
-                    (note.x, note.y, NOTE_WIDTH, NOTE_HEIGHT)
-                )
-            elif note.state == 'missed':
-                color = RED
-                pygame.draw.rect(
-                    self.screen,
-                    color,
-                    (note.x, note.y, NOTE_WIDTH, NOTE_HEIGHT)
-                )
+        # Draw notes in one batched blit
+        active_surf = self.note_surf_active
+        missed_surf = self.note_surf_missed
+        self.screen.blits([
+            (active_surf if note.state == 'active' else missed_surf, (note.x, note.y))
+            for note in self.note_generator.notes
+            if note.state != 'hit'
+        ], doreturn=False)
 
         # Display game information
         if self.mode == "normal":
@@ -498,109 +664,112 @@ class Game:
     def draw_game_info(self):
         """Draw game information."""
         time_left = max(0, GAME_DURATION - self.current_time)
-        info_texts = [
-            f"Time: {int(time_left)}",
-            f"Level: {self.current_level}",
-            f"Hits: {self.hits}",
-            f"Combo: {self.combo}"
+        info_values = [
+            ("Time", int(time_left)),
+            ("Level", self.current_level),
+            ("Hits", self.hits),
+            ("Combo", self.combo)
         ]
 
-        for i, text in enumerate(info_texts):
-            surface = self.font.render(text, True, WHITE)
-            self.screen.blit(surface, (10, 10 + i * 30))
+        for i, (name, value) in enumerate(info_values):
+            self.draw_info_line(name, value, 10 + i * 30)
 
     def draw_test_info(self):
         """Draw test mode game information."""
         time_left = max(0, GAME_DURATION - self.current_time)
-        info_text = f"Time: {int(time_left)}"
-        surface = self.font.render(info_text, True, WHITE)
-        self.screen.blit(surface, (10, 10))
+        self.draw_info_line("Time", int(time_left), 10)
+
+    def draw_info_line(self, name: str, value: int, y: int):
+        """Draw a cached HUD label followed by its value."""
+        label = self._label_surfs[name]
+        self.screen.blit(label, (10, y))
+        self.screen.blit(self._render_int(value), (10 + label.get_width(), y))
+
+    def render_number(self, value: int) -> pygame.Surface:
+        """Render an integer for the HUD."""
+        return self.font.render(str(value), True, WHITE)
 
     def get_player_name(self):
         """Get the player's name."""
         input_box = pygame.Rect(WINDOW_WIDTH//4, WINDOW_HEIGHT//2, WINDOW_WIDTH//2, 40)
         name = ""
         input_active = True
+        redraw = True
 
         while input_active:
-            for event in pygame.event.get():
-                if event.type == pygame.QUIT:
-                    pygame.quit()
-                    return
-
-                if event.type == pygame.KEYDOWN:
-                    if event.key == pygame.K_RETURN:
-                        self.player_name = name if name else "Player"
-                        input_active = False
-                    elif event.key == pygame.K_BACKSPACE:
-                        name = name[:-1]
-                    else:
-                        name += event.unicode
+            if redraw:
+                self.screen.fill(BLACK)
+                txt_surface = self.font.render("Enter your name:", True, WHITE)
+                input_txt = self.font.render(name, True, WHITE)
 
-            self.screen.fill(BLACK)
-            txt_surface = self.font.render("Enter your name:", True, WHITE)
-            input_txt = self.font.render(name, True, WHITE)
+                self.screen.blit(txt_surface, (WINDOW_WIDTH//4, WINDOW_HEIGHT//2 - 50))
+                pygame.draw.rect(self.screen, WHITE, input_box, 2)
+                self.screen.blit(input_txt, (input_box.x + 5, input_box.y + 5))
 
-            self.screen.blit(txt_surface, (WINDOW_WIDTH//4, WINDOW_HEIGHT//2 - 50))
-            pygame.draw.rect(self.screen, WHITE, input_box, 2)
-            self.screen.blit(input_txt, (input_box.x + 5, input_box.y + 5))
+                pygame.display.flip()
+                redraw = False
 
-            pygame.display.flip()
-            self.clock.tick(FPS)
+            # Block until the next event; redraw on key presses or window exposure
+            event = pygame.event.wait()
+            if event.type in REDRAW_EVENTS:
+                redraw = True
 
-    def update(self):
-        """Update game state."""
-        if not self.paused and not self.in_menu and not self.game_over:
-            self.current_time = time.time() - self.start_time - self.total_paused_time  # Update current_time
-
-            # Update note generation
-            self.note_generator.update(self.current_time)
-
-            # Update note positions
-            for note in self.note_generator.notes[:]:
-                if note.state == 'active':
-                    note.y += note.speed
-
-                    # Set the time when the note becomes hittable
-                    if note.start_hit_time is None and note.y >= HIT_LINE_Y - NOTE_HEIGHT:
-                        note.start_hit_time = time.time()
-
-                    # Check if the note has been missed
-                    if note.y > HIT_LINE_Y and note.state == 'active':
-                        note.state = 'missed'
-                        note.miss_time = time.time()
-                        self.combo = 0
-                        self.data_collector.record_hit(note, self.current_level, 'miss')
-                        self.total_notes += 1
-
-                elif note.state == 'missed':
-                    # Remove missed notes after a certain time
-                    if time.time() - note.miss_time > 0.5:
-                        self.note_generator.notes.remove(note)
-
-            # Update the red line flash timer
-            if self.hit_line_flash_timer > 0:
-                delta_time = self.clock.get_time() / 1000.0  # Convert to seconds
-                self.hit_line_flash_timer -= delta_time
-                if self.hit_line_flash_timer < 0:
-                    self.hit_line_flash_timer = 0
-
-            # Check for level completion
-            if self.current_time >= GAME_DURATION:
-                self.show_feedback()
-                self.current_level += 1
-                if self.current_level > LEVELS:
-                    self.game_over = True
-                    self.in_menu = True
+            if event.type == pygame.QUIT:
+                pygame.quit()
+                return
+
+            if event.type == pygame.KEYDOWN:
+                if event.key == pygame.K_RETURN:
+                    self.player_name = name if name else "Player"
+                    input_active = False
+                elif event.key == pygame.K_BACKSPACE:
+                    name = name[:-1]
+                    redraw = True
                 else:
-                    self.difficulty_manager.set_level(self.current_level)
-                    self.note_generator = NoteGenerator(self.difficulty_manager)
-                    self.start_time = time.time()
-                    self.combo = 0
-                    self.hits = 0
-                    self.incorrect_hits = 0
-                    self.total_paused_time = 0
-                    self.current_time = 0  # Reset current_time
+                    name += event.unicode
+                    redraw = True
+
+    def update(self):
+        """Update game state while a level is being played."""
+        now = _now()  # Read the clock once per frame
+        self.current_time = (now - self.start_time_ns - self.total_paused_ns) / NS_PER_SECOND  # Update current_time
+
+        # Update note generation
+        self.note_generator.update(self.current_time)
+
+        # Update note positions
+        for note in self.note_generator.advance(now):
+            self.combo = 0
+            self.data_collector.record_hit(note, self.current_level, 'miss')
+            self.total_notes += 1
+
+        # Update the red line flash timer
+        if self.hit_line_flash_timer > 0:
+            delta_time = self.clock.get_time() / 1000.0  # Convert to seconds
+            self.hit_line_flash_timer -= delta_time
+            if self.hit_line_flash_timer < 0:
+                self.hit_line_flash_timer = 0
+
+        # Check for level completion
+        if self.current_time >= GAME_DURATION:
+            self.show_feedback()
+            self.current_level += 1
+            if self.current_level > LEVELS:
+                self.game_over = True
+                self.in_menu = True
+                self.set_handlers()
+            else:
+                self.difficulty_manager.set_level(self.current_level)
+                self.note_generator.reset()
+                self.start_time_ns = _now()
+                self.combo = 0
+                self.hits = 0
+                self.incorrect_hits = 0
+                self.total_paused_ns = 0
+                self.current_time = 0  # Reset current_time
+
+    def update_idle(self):
+        """Leave game state untouched while paused or in the menu."""
 
     def show_feedback(self, skipped=False):
         """Display feedback questionnaire."""
@@ -611,21 +780,11 @@ class Game:
         ]
         answers = []
         current_question = 0
+        redraw = True
 
         while current_question < len(questions):
-            for event in pygame.event.get():
-                if event.type == pygame.QUIT:
-                    pygame.quit()
-                    return
-
-                if event.type == pygame.KEYDOWN:
-                    if event.unicode in "12345":
-                        answers.append(int(event.unicode))
-                        current_question += 1
-
-            self.screen.fill(BLACK)
-
-            if current_question < len(questions):
+            if redraw:
+                self.screen.fill(BLACK)
                 question_surface = self.font.render(
                     questions[current_question], True, WHITE
                 )
@@ -633,9 +792,23 @@ class Game:
                     question_surface,
                     (WINDOW_WIDTH//2 - question_surface.get_width()//2, WINDOW_HEIGHT//2)
                 )
+                pygame.display.flip()
+                redraw = False
 
-            pygame.display.flip()
-            self.clock.tick(FPS)
+            # Block until the next event; redraw on an answer or window exposure
+            event = pygame.event.wait()
+            if event.type in REDRAW_EVENTS:
+                redraw = True
+
+            if event.type == pygame.QUIT:
+                pygame.quit()
+                return
+
+            if event.type == pygame.KEYDOWN:
+                if event.unicode in "12345":
+                    answers.append(int(event.unicode))
+                    current_question += 1
+                    redraw = True
 
         # Calculate game duration and exit rate
         total_time = self.current_time
@@ -652,14 +825,15 @@ class Game:
         if self.current_level > LEVELS:
             self.game_over = True
             self.in_menu = True
+            self.set_handlers()
         else:
             self.difficulty_manager.set_level(self.current_level)
-            self.note_generator = NoteGenerator(self.difficulty_manager)
-            self.start_time = time.time()
+            self.note_generator.reset()
+            self.start_time_ns = _now()
             self.combo = 0
             self.hits = 0
             self.incorrect_hits = 0
-            self.total_paused_time = 0
+            self.total_paused_ns = 0
             self.current_time = 0
 
     def return_to_menu(self):
@@ -667,15 +841,19 @@ class Game:
         self.show_feedback(skipped=True)
         self.in_menu = True
         self.game_over = True
+        self.set_handlers()
 
     def run(self):
         """Run the game's main loop."""
         while self.running:
             self.handle_input()
-            self.update()
+            self.update_handler()
             self.draw()
             self.clock.tick(FPS)
 
+        if self.data_collector is not None:
+            self.data_collector.close()
+
 if __name__ == "__main__":
     game = Game()
     game.run()